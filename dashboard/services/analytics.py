@@ -1,5 +1,157 @@
+from bisect import bisect_right
+
+import numpy as np
 import pandas as pd
 
+# =========================================================
+# ORDER PREPARATION
+# =========================================================
+
+
+def fast_to_datetime(series: pd.Series) -> pd.Series:
+    """
+    WHAT: pd.to_datetime(errors="coerce") that parses each distinct value once
+    WHY: Order timestamps repeat heavily, so parsing the uniques and mapping
+    them back is much cheaper than parsing every row
+    """
+
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+
+    codes, uniques = pd.factorize(series)
+    parsed = pd.to_datetime(uniques, errors="coerce")
+
+    # Missing values factorize to -1 and come back as NaT
+    return pd.Series(
+        parsed.take(codes, allow_fill=True, fill_value=pd.NaT),
+        index=series.index,
+        name=series.name,
+    )
+
+
+def prepare_orders(orders_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    WHAT: Orders with parsed dates and precomputed delivery delay columns
+    WHY: Delay KPIs, charts and the ML dataset share one date parse
+
+    Adds:
+    purchase_month (Int32 key year * 12 + month - 1, see _month_label),
+    delay_days (Int32, <NA> if undelivered),
+    is_delayed (bool, delivered after the estimated date)
+    """
+
+    purchased = fast_to_datetime(orders_df["order_purchase_timestamp"])
+    delivered = fast_to_datetime(orders_df["order_delivered_customer_date"])
+    estimated = fast_to_datetime(orders_df["order_estimated_delivery_date"])
+
+    return orders_df.assign(
+        order_purchase_timestamp=purchased,
+        order_delivered_customer_date=delivered,
+        order_estimated_delivery_date=estimated,
+        purchase_month=(purchased.dt.year * 12 + purchased.dt.month - 1).astype(
+            "Int32"
+        ),
+        delay_days=(delivered - estimated).dt.days.astype("Int32"),
+        is_delayed=delivered > estimated,
+    )
+
+
+def sum_per_order(order_items_df: pd.DataFrame, column: str) -> pd.DataFrame:
+    """
+    WHAT: Sum of an order_items column per order_id
+    WHY: With items sorted by order_id (as loaded), every order is one
+    contiguous run, so np.add.reduceat sums all runs in one linear pass
+    without building a hash table
+
+    NOTE:
+    Matches groupby("order_id")[column].sum(): missing ids are dropped,
+    missing values count as 0 and the result is sorted by order_id
+    """
+
+    # Only the key and the summed column, and only mask when ids are missing
+    items = order_items_df[["order_id", column]]
+
+    if items["order_id"].hasnans:
+        items = items[items["order_id"].notna()]
+
+    if not items["order_id"].is_monotonic_increasing:
+        items = items.sort_values("order_id", kind="stable")
+
+    order_ids = items["order_id"]
+
+    # Compare plain ndarrays (codes for categoricals): Series.ne on nullable
+    # string dtypes yields <NA> at the first row instead of a boolean
+    if isinstance(order_ids.dtype, pd.CategoricalDtype):
+        ids = order_ids.cat.codes.to_numpy()
+    else:
+        ids = order_ids.to_numpy()
+
+    # First row of every run of equal ids
+    run_start = np.ones(len(ids), dtype=bool)
+    run_start[1:] = ids[1:] != ids[:-1]
+    starts = np.flatnonzero(run_start)
+
+    values = items[column].to_numpy(dtype="float64", na_value=0.0)
+
+    return pd.DataFrame(
+        {
+            "order_id": order_ids.array.take(starts),
+            column: np.add.reduceat(values, starts) if len(starts) else values,
+        }
+    )
+
+
+def prepare_revenue_per_order(order_items_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    WHAT: Product revenue (sum of item prices) per order
+    WHY: AOV, segmentation and payment analysis share one order-level
+    aggregation instead of each re-grouping order_items
+    """
+    return sum_per_order(order_items_df, "price").rename(
+        columns={"price": "order_revenue"}
+    )
+
+
+def prepare_orders_customers(
+    orders_df: pd.DataFrame, customers_df: pd.DataFrame
+) -> pd.DataFrame:
+    """
+    WHAT: order_id / customer_id / customer_unique_id, one row per order
+    WHY: Repeat rate and segmentation share one orders-customers join
+
+    NOTE:
+    Uses customer_unique_id (real customer identifier)
+    """
+    return orders_df[["order_id", "customer_id"]].merge(
+        customers_df[["customer_id", "customer_unique_id"]],
+        on="customer_id",
+        how="left",
+    )
+
+
+def _month_label(month_key: int) -> str:
+    """Format a purchase_month key from prepare_orders as YYYY-MM."""
+    year, month = divmod(int(month_key), 12)
+    return f"{year}-{month + 1:02d}"
+
+
+def _group_nansum(keys: pd.Series, values: pd.Series) -> pd.Series:
+    """
+    Sum values per key in one np.bincount pass over factorized codes.
+    Matches groupby(...).sum(): missing keys are dropped, missing values
+    count as 0 and the result is sorted by key.
+    """
+
+    codes, uniques = pd.factorize(keys, sort=True)
+    weights = values.to_numpy(dtype="float64", na_value=0.0)
+
+    present = codes >= 0
+
+    sums = np.bincount(codes[present], weights=weights[present], minlength=len(uniques))
+
+    return pd.Series(sums, index=pd.Index(uniques, name=keys.name))
+
+
 # =========================================================
 # KPI FUNCTIONS
 # =========================================================
@@ -18,39 +170,29 @@ def calculate_total_revenue(order_items_df: pd.DataFrame) -> float:
     WHAT: Total revenue from all order items (price + freight)
     WHY: Measures gross sales value
     """
-    return float(
-        (order_items_df["price"] + order_items_df["freight_value"]).sum().round(2)
-    )
+    price = order_items_df["price"].to_numpy(dtype="float64", na_value=np.nan)
+    freight = order_items_df["freight_value"].to_numpy(dtype="float64", na_value=np.nan)
+
+    # As with (price + freight).sum(), an item only counts when both
+    # values are present
+    present = ~(np.isnan(price) | np.isnan(freight))
+
+    if not present.all():
+        price, freight = price[present], freight[present]
+
+    # Two column reductions, no temporary price + freight array
+    return round(float(price.sum() + freight.sum()), 2)
 
 
 def calculate_delayed_orders(orders_df: pd.DataFrame) -> int:
     """
     WHAT: Number of orders delivered after estimated delivery date
     WHY: Measures logistics performance
-    """
-
-    orders = orders_df.copy()
-
-    orders["order_delivered_customer_date"] = pd.to_datetime(
-        orders["order_delivered_customer_date"], errors="coerce"
-    )
-    orders["order_estimated_delivery_date"] = pd.to_datetime(
-        orders["order_estimated_delivery_date"], errors="coerce"
-    )
-
-    orders = orders.dropna(
-        subset=[
-            "order_delivered_customer_date",
-            "order_estimated_delivery_date",
-        ]
-    )
-
-    delayed_orders = orders[
-        orders["order_delivered_customer_date"]
-        > orders["order_estimated_delivery_date"]
-    ]
 
-    return int(delayed_orders["order_id"].nunique())
+    NOTE:
+    Expects orders from prepare_orders (one row per order)
+    """
+    return int(orders_df["is_delayed"].sum())
 
 
 def calculate_average_review_score(reviews_df: pd.DataFrame) -> float:
@@ -58,29 +200,24 @@ def calculate_average_review_score(reviews_df: pd.DataFrame) -> float:
     WHAT: Average customer review score
     WHY: Measures overall customer satisfaction
     """
-    return float(reviews_df["review_score"].mean().round(2))
+    return round(
+        float(np.nanmean(reviews_df["review_score"].to_numpy(dtype="float64"))), 2
+    )
 
 
-def calculate_repeat_customer_rate(
-    orders_df: pd.DataFrame, customers_df: pd.DataFrame
-) -> float:
+def calculate_repeat_customer_rate(orders_customers: pd.DataFrame) -> float:
     """
     WHAT: Percentage of customers who placed more than one order
     WHY: Measures customer retention
 
     NOTE:
-    Uses customer_unique_id (real customer identifier)
+    Expects orders joined by prepare_orders_customers
     """
 
-    orders_customers = orders_df.merge(
-        customers_df[["customer_id", "customer_unique_id"]],
-        on="customer_id",
-        how="left",
-    )
-
-    orders_per_customer = orders_customers.groupby("customer_unique_id")[
-        "order_id"
-    ].nunique()
+    # orders has one row per order, so group size is the order count
+    orders_per_customer = orders_customers.groupby(
+        "customer_unique_id", observed=True
+    ).size()
 
     total_customers = int(orders_per_customer.shape[0])
     repeat_customers = int((orders_per_customer > 1).sum())
@@ -100,28 +237,23 @@ def orders_over_time(orders_df: pd.DataFrame) -> pd.DataFrame:
     """
     WHAT: Orders per month
     WHY: Shows demand trend over time
+
+    NOTE:
+    Expects orders from prepare_orders
     """
 
-    df = orders_df.copy()
-    df["order_purchase_timestamp"] = pd.to_datetime(
-        df["order_purchase_timestamp"], errors="coerce"
-    )
+    # Group on the integer month key, then split it into year / month
+    monthly = orders_df.groupby("purchase_month").size()
 
-    result = (
-        df.dropna(subset=["order_purchase_timestamp"])
-        .groupby(
-            [
-                df["order_purchase_timestamp"].dt.year.rename("year"),
-                df["order_purchase_timestamp"].dt.month.rename("month"),
-            ]
-        )
-        .size()
-        .reset_index(name="order_count")
-        .sort_values(["year", "month"])
-        .reset_index(drop=True)
-    )
+    year, month = np.divmod(monthly.index.to_numpy(dtype="int64"), 12)
 
-    return result
+    return pd.DataFrame(
+        {
+            "year": year,
+            "month": month + 1,
+            "order_count": monthly.to_numpy(),
+        }
+    )
 
 
 def revenue_by_category(
@@ -134,13 +266,26 @@ def revenue_by_category(
     WHY: Identifies high-performing categories
     """
 
-    df = order_items_df.merge(products_df, on="product_id", how="left").merge(
-        translations_df, on="product_category_name", how="left"
+    # Aggregate per product before joining, so the joins see one row per
+    # product instead of one row per order item
+    product_revenue = _group_nansum(
+        order_items_df["product_id"], order_items_df["price"]
+    ).reset_index(name="revenue")
+
+    # Only the join keys and category columns go through the merges
+    df = product_revenue.merge(
+        products_df[["product_id", "product_category_name"]],
+        on="product_id",
+        how="left",
+    ).merge(
+        translations_df[["product_category_name", "product_category_name_english"]],
+        on="product_category_name",
+        how="left",
     )
 
     revenue = (
-        df.groupby("product_category_name_english", as_index=False)
-        .agg(revenue=("price", "sum"))
+        _group_nansum(df["product_category_name_english"], df["revenue"])
+        .reset_index(name="revenue")
         .sort_values("revenue", ascending=False)
         .head(10)
     )
@@ -154,65 +299,48 @@ def delivery_delay_distribution(orders_df: pd.DataFrame) -> dict:
     """
     WHAT: Distribution of early / on-time / delayed deliveries
     WHY: Visualizes logistics reliability
-    """
 
-    df = orders_df.copy()
-
-    df["order_delivered_customer_date"] = pd.to_datetime(
-        df["order_delivered_customer_date"], errors="coerce"
-    )
-    df["order_estimated_delivery_date"] = pd.to_datetime(
-        df["order_estimated_delivery_date"], errors="coerce"
-    )
+    NOTE:
+    Expects orders from prepare_orders
+    """
 
-    df = df.dropna(
-        subset=[
-            "order_delivered_customer_date",
-            "order_estimated_delivery_date",
-        ]
-    )
+    delay_days = orders_df["delay_days"].dropna().to_numpy(dtype="int64")
 
-    delay_days = (
-        df["order_delivered_customer_date"] - df["order_estimated_delivery_date"]
-    ).dt.days
+    # One pass: sign -1/0/1 shifted to bucket 0/1/2
+    buckets = np.bincount(np.sign(delay_days) + 1, minlength=3)
 
     return {
-        "Early": int((delay_days < 0).sum()),
-        "On Time": int((delay_days == 0).sum()),
-        "Delayed": int((delay_days > 0).sum()),
+        "Early": int(buckets[0]),
+        "On Time": int(buckets[1]),
+        "Delayed": int(buckets[2]),
     }
 
 
 def calculate_aov_over_time(
-    orders_df: pd.DataFrame, order_items_df: pd.DataFrame
+    orders_df: pd.DataFrame, revenue_per_order: pd.DataFrame
 ) -> dict:
     """
     WHAT: Average Order Value (AOV) per month
     WHY: Shows spending behavior trends
-    """
 
-    orders = orders_df.copy()
-    orders["order_purchase_timestamp"] = pd.to_datetime(
-        orders["order_purchase_timestamp"], errors="coerce"
-    )
+    NOTE:
+    Expects orders from prepare_orders and revenue from
+    prepare_revenue_per_order
+    """
 
-    revenue_per_order = order_items_df.groupby("order_id", as_index=False).agg(
-        order_revenue=("price", "sum")
+    merged = orders_df[["order_id", "purchase_month"]].merge(
+        revenue_per_order, on="order_id", how="inner"
     )
 
-    merged = orders.merge(revenue_per_order, on="order_id", how="inner")
-
-    merged["month"] = merged["order_purchase_timestamp"].dt.to_period("M").astype(str)
-
-    monthly = merged.groupby("month", as_index=False).agg(
+    monthly = merged.groupby("purchase_month", as_index=False).agg(
         total_revenue=("order_revenue", "sum"),
-        total_orders=("order_id", "nunique"),
+        total_orders=("order_id", "size"),
     )
 
     monthly["aov"] = (monthly["total_revenue"] / monthly["total_orders"]).round(2)
 
     return {
-        "labels": monthly["month"].tolist(),
+        "labels": [_month_label(key) for key in monthly["purchase_month"]],
         "values": monthly["aov"].tolist(),
     }
 
@@ -223,47 +351,38 @@ def calculate_aov_over_time(
 
 
 def customer_segmentation(
-    orders_df: pd.DataFrame,
-    order_items_df: pd.DataFrame,
-    customers_df: pd.DataFrame,
+    orders_customers: pd.DataFrame,
+    revenue_per_order: pd.DataFrame,
 ) -> pd.DataFrame:
     """
     WHAT: Segment customers by purchase frequency
     WHY: Understand retention and revenue concentration
-    """
 
-    orders_customers = orders_df.merge(
-        customers_df[["customer_id", "customer_unique_id"]],
-        on="customer_id",
-        how="left",
-    )
+    NOTE:
+    Expects orders joined by prepare_orders_customers and revenue from
+    prepare_revenue_per_order
+    """
 
     order_counts = (
-        orders_customers.groupby("customer_unique_id")["order_id"]
-        .nunique()
+        orders_customers.groupby("customer_unique_id", observed=True)
+        .size()
         .reset_index(name="order_count")
     )
 
-    def segment(count: int) -> str:
-        if count == 1:
-            return "New"
-        elif count <= 2:
-            return "Returning"
-        return "Loyal"
-
-    order_counts["segment"] = order_counts["order_count"].apply(segment)
-
-    revenue_per_order = order_items_df.groupby("order_id", as_index=False).agg(
-        order_revenue=("price", "sum")
+    # New: 1 order, Returning: 2 orders, Loyal: 3+ orders
+    counts = order_counts["order_count"].to_numpy()
+    order_counts["segment"] = pd.Categorical.from_codes(
+        np.where(counts == 1, 0, np.where(counts <= 2, 1, 2)),
+        categories=["New", "Returning", "Loyal"],
     )
 
     merged = orders_customers.merge(revenue_per_order, on="order_id", how="left").merge(
         order_counts, on="customer_unique_id", how="left"
     )
 
-    result = merged.groupby("segment", as_index=False).agg(
+    result = merged.groupby("segment", as_index=False, observed=True).agg(
         customers=("customer_unique_id", "nunique"),
-        orders=("order_id", "nunique"),
+        orders=("order_id", "size"),
         revenue=("order_revenue", "sum"),
     )
 
@@ -276,30 +395,16 @@ def review_vs_delay(orders_df: pd.DataFrame, reviews_df: pd.DataFrame) -> pd.Dat
     """
     WHAT: Compare review scores for on-time vs delayed orders
     WHY: Measures customer experience impact of delivery delays
-    """
-
-    orders = orders_df.copy()
 
-    orders["order_delivered_customer_date"] = pd.to_datetime(
-        orders["order_delivered_customer_date"], errors="coerce"
-    )
-    orders["order_estimated_delivery_date"] = pd.to_datetime(
-        orders["order_estimated_delivery_date"], errors="coerce"
-    )
-
-    orders = orders.dropna(
-        subset=[
-            "order_delivered_customer_date",
-            "order_estimated_delivery_date",
-        ]
-    )
+    NOTE:
+    Expects orders from prepare_orders
+    """
 
-    orders["is_delayed"] = (
-        orders["order_delivered_customer_date"]
-        > orders["order_estimated_delivery_date"]
-    )
+    delivered = orders_df.loc[
+        orders_df["delay_days"].notna(), ["order_id", "is_delayed"]
+    ]
 
-    merged = orders.merge(
+    merged = delivered.merge(
         reviews_df[["order_id", "review_score"]],
         on="order_id",
         how="inner",
@@ -322,9 +427,18 @@ def review_vs_delay(orders_df: pd.DataFrame, reviews_df: pd.DataFrame) -> pd.Dat
     )
 
 
+PAYMENT_TYPE_LABELS = {
+    "credit_card": "Credit Card",
+    "boleto": "Boleto",
+    "voucher": "Voucher",
+    "debit_card": "Debit Card",
+    "not_defined": "Other / Unknown",
+}
+
+
 def payment_method_analysis(
     payments_df: pd.DataFrame,
-    order_items_df: pd.DataFrame,
+    revenue_per_order: pd.DataFrame,
 ) -> pd.DataFrame:
     """
     WHAT:
@@ -332,37 +446,86 @@ def payment_method_analysis(
 
     WHY:
     Understand customer payment preferences and revenue contribution
-    """
 
-    # Order-level revenue
-    order_revenue = order_items_df.groupby("order_id", as_index=False).agg(
-        order_revenue=("price", "sum")
-    )
+    NOTE:
+    Expects revenue from prepare_revenue_per_order
+    """
 
-    # Merge
-    merged = payments_df.merge(order_revenue, on="order_id", how="left")
-    merged["order_revenue"] = merged["order_revenue"].fillna(0)
+    # Merge order-level revenue (orders without items stay NaN and are
+    # summed as 0 by _group_nansum)
+    merged = payments_df.merge(revenue_per_order, on="order_id", how="left")
 
-    # Aggregate
-    result = merged.groupby("payment_type", as_index=False).agg(
-        orders=("order_id", "nunique"),
-        revenue=("order_revenue", "sum"),
+    # Aggregate (an order can have several payment rows of the same type,
+    # so orders are counted on distinct payment_type/order_id pairs)
+    orders = (
+        merged.drop_duplicates(["payment_type", "order_id"])
+        .groupby("payment_type", observed=True)
+        .size()
     )
+    revenue = _group_nansum(merged["payment_type"], merged["order_revenue"])
 
-    result["payment_type"] = (
-        result["payment_type"].str.replace("_", " ", regex=False).str.title()
-    )
+    result = pd.DataFrame({"orders": orders, "revenue": revenue}).reset_index()
 
-    # Optional: clean ugly category
-    result["payment_type"] = result["payment_type"].replace(
-        {"Not Defined": "Other / Unknown"}
-    )
+    # Display names (one row per payment type, so a plain lookup);
+    # unexpected types fall back to title case
+    result["payment_type"] = [
+        PAYMENT_TYPE_LABELS.get(name, name.replace("_", " ").title())
+        for name in result["payment_type"]
+    ]
 
     result["revenue"] = result["revenue"].round(2)
 
     return result.sort_values("revenue", ascending=False).reset_index(drop=True)
 
 
+# Retention bands over repeat_rate: [0, 25) [25, 50) [50, 75) [75, 100]
+RETENTION_THRESHOLDS = [25, 50, 75]
+RETENTION_BANDS = [
+    # (retention_band, severity_score)
+    ("low", 3),
+    ("moderate", 2),
+    ("strong", 1),
+    ("very strong", 0),
+]
+
+# Driver bands over delay_rate: [0, 25) [25, 50) [50, 100]
+DELAY_THRESHOLDS = [25, 50]
+DELAY_DRIVERS = [
+    # (primary_driver, driver_message)
+    (
+        "post-purchase engagement",
+        "Delivery performance appears stable, indicating that post-purchase"
+        " engagement and communication may be limiting retention.",
+    ),
+    (
+        "delivery experience",
+        "Delivery delays affect a significant portion of orders and may be"
+        " impacting customer satisfaction.",
+    ),
+    (
+        "logistics reliability",
+        "A high delivery delay rate suggests logistics performance is a major"
+        " contributor to low repeat purchases.",
+    ),
+]
+
+_HEALTHY_RETENTION_RECOMMENDATION = (
+    "Retention performance is healthy. Continued focus on customer experience"
+    " can help sustain repeat purchasing behavior."
+)
+
+# Indexed by severity_score
+RETENTION_RECOMMENDATIONS = [
+    _HEALTHY_RETENTION_RECOMMENDATION,
+    _HEALTHY_RETENTION_RECOMMENDATION,
+    "Retention shows early potential. Targeted improvements in customer"
+    " experience could help convert first-time buyers into repeat customers.",
+    "Retention is critically low. Prioritizing improvements in delivery"
+    " reliability and post-purchase experience could significantly improve"
+    " repeat purchases.",
+]
+
+
 def build_retention_insight(
     repeat_rate: float,
     delayed_orders: int,
@@ -381,40 +544,16 @@ def build_retention_insight(
     # -------------------------
     # Retention classification
     # -------------------------
-    if repeat_rate < 25:
-        retention_band = "low"
-        severity_score = 3
-    elif repeat_rate < 50:
-        retention_band = "moderate"
-        severity_score = 2
-    elif repeat_rate < 75:
-        retention_band = "strong"
-        severity_score = 1
-    else:
-        retention_band = "very strong"
-        severity_score = 0
+    retention_band, severity_score = RETENTION_BANDS[
+        bisect_right(RETENTION_THRESHOLDS, repeat_rate)
+    ]
 
     # -------------------------
     # Primary driver analysis
     # -------------------------
-    if delay_rate >= 50:
-        primary_driver = "logistics reliability"
-        driver_message = (
-            "A high delivery delay rate suggests logistics performance is a major"
-            " contributor to low repeat purchases."
-        )
-    elif delay_rate >= 25:
-        primary_driver = "delivery experience"
-        driver_message = (
-            "Delivery delays affect a significant portion of orders and may be"
-            " impacting customer satisfaction."
-        )
-    else:
-        primary_driver = "post-purchase engagement"
-        driver_message = (
-            "Delivery performance appears stable, indicating that post-purchase"
-            " engagement and communication may be limiting retention."
-        )
+    primary_driver, driver_message = DELAY_DRIVERS[
+        bisect_right(DELAY_THRESHOLDS, delay_rate)
+    ]
 
     # -------------------------
     # Executive summary text
@@ -427,22 +566,7 @@ def build_retention_insight(
     # -------------------------
     # Recommendation logic
     # -------------------------
-    if severity_score >= 3:
-        recommendation = (
-            "Retention is critically low. Prioritizing improvements in delivery"
-            " reliability and post-purchase experience could significantly improve"
-            " repeat purchases."
-        )
-    elif severity_score == 2:
-        recommendation = (
-            "Retention shows early potential. Targeted improvements in customer"
-            " experience could help convert first-time buyers into repeat customers."
-        )
-    else:
-        recommendation = (
-            "Retention performance is healthy. Continued focus on customer experience"
-            " can help sustain repeat purchasing behavior."
-        )
+    recommendation = RETENTION_RECOMMENDATIONS[severity_score]
 
     return {
         "repeat_rate": round(repeat_rate, 2),
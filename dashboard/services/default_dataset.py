@@ -1,22 +1,229 @@
+import hashlib
+import os
+import tempfile
+
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parents[2]
 
 DATA_PATH = BASE_DIR / "data" / "default"
 
+CACHE_PATH = DATA_PATH / "cache"
 
-def Load_olist_datasets():
-    return {
-        "orders": pd.read_csv(DATA_PATH / "olist_orders_dataset.csv"),
-        "customers": pd.read_csv(DATA_PATH / "olist_customers_dataset.csv"),
-        "order_items": pd.read_csv(DATA_PATH / "olist_order_items_dataset.csv"),
-        "products": pd.read_csv(DATA_PATH / "olist_products_dataset.csv"),
-        "order_reviews": pd.read_csv(DATA_PATH / "olist_order_reviews_dataset.csv"),
-        "order_payments": pd.read_csv(DATA_PATH / "olist_order_payments_dataset.csv"),
-        "sellers": pd.read_csv(DATA_PATH / "olist_sellers_dataset.csv"),
-        "category_translation": pd.read_csv(
-            DATA_PATH / "product_category_name_translation.csv"
+DATASET_FILES = {
+    "orders": "olist_orders_dataset.csv",
+    "customers": "olist_customers_dataset.csv",
+    "order_items": "olist_order_items_dataset.csv",
+    "products": "olist_products_dataset.csv",
+    "order_reviews": "olist_order_reviews_dataset.csv",
+    "order_payments": "olist_order_payments_dataset.csv",
+    "sellers": "olist_sellers_dataset.csv",
+    "category_translation": "product_category_name_translation.csv",
+    "geolocation": "olist_geolocation_dataset.csv",
+}
+
+_CATEGORY = pa.dictionary(pa.int32(), pa.string())
+_TIMESTAMP = pa.timestamp("ns")
+
+# Explicit Arrow types so the CSVs are only type-inferred once, when the
+# parquet cache is built. Everything not listed is inferred by pyarrow.
+DATASET_COLUMN_TYPES = {
+    "orders": {
+        "order_id": pa.string(),
+        "customer_id": pa.string(),
+        "order_purchase_timestamp": _TIMESTAMP,
+        "order_approved_at": _TIMESTAMP,
+        "order_delivered_carrier_date": _TIMESTAMP,
+        "order_delivered_customer_date": _TIMESTAMP,
+        "order_estimated_delivery_date": _TIMESTAMP,
+    },
+    "customers": {
+        "customer_id": pa.string(),
+        "customer_unique_id": pa.string(),
+    },
+    "order_items": {
+        "order_id": pa.string(),
+        "product_id": pa.string(),
+        "seller_id": pa.string(),
+    },
+    "products": {
+        "product_id": pa.string(),
+        "product_category_name": _CATEGORY,
+    },
+    "order_reviews": {
+        "review_id": pa.string(),
+        "order_id": pa.string(),
+    },
+    "order_payments": {
+        "order_id": pa.string(),
+        "payment_type": _CATEGORY,
+    },
+    "sellers": {
+        "seller_id": pa.string(),
+    },
+    "category_translation": {
+        "product_category_name": _CATEGORY,
+    },
+}
+
+# Key columns converted to categoricals at load. Every table holding the
+# column gets the same categories, so merges and groupbys on these keys
+# work on integer codes instead of hashing strings.
+SHARED_CATEGORY_COLUMNS = {
+    "order_id": ["orders", "order_items", "order_reviews", "order_payments"],
+    "customer_id": ["orders", "customers"],
+    "customer_unique_id": ["customers"],
+    "product_id": ["order_items", "products"],
+    "product_category_name": ["products", "category_translation"],
+    "payment_type": ["order_payments"],
+}
+
+
+# Bump whenever _read_csv_table's options change. Column type changes are
+# picked up by the stamp on their own.
+CACHE_VERSION = 1
+
+CACHE_STAMP_KEY = b"ecommerce_analytics.cache_stamp"
+
+
+def _cache_stamp(name: str) -> bytes:
+    column_types = DATASET_COLUMN_TYPES.get(name, {})
+    spec = [CACHE_VERSION] + [
+        f"{column}:{kind}" for column, kind in column_types.items()
+    ]
+
+    return hashlib.sha256(repr(spec).encode()).hexdigest().encode()
+
+
+def _cache_is_fresh(name: str, csv_path: Path, parquet_path: Path) -> bool:
+    if (
+        not parquet_path.exists()
+        or parquet_path.stat().st_mtime < csv_path.stat().st_mtime
+    ):
+        return False
+
+    try:
+        metadata = pq.read_schema(parquet_path).metadata or {}
+    except pa.ArrowInvalid:
+        return False
+
+    return metadata.get(CACHE_STAMP_KEY) == _cache_stamp(name)
+
+
+def _read_csv_table(name: str) -> pa.Table:
+    csv_path = DATA_PATH / DATASET_FILES[name]
+
+    return pacsv.read_csv(
+        csv_path,
+        # Review comments contain line breaks inside quoted values
+        parse_options=pacsv.ParseOptions(newlines_in_values=True),
+        convert_options=pacsv.ConvertOptions(
+            column_types=DATASET_COLUMN_TYPES.get(name, {}),
+            # Empty fields are missing values, as with pd.read_csv
+            strings_can_be_null=True,
         ),
-        "geolocation": pd.read_csv(DATA_PATH / "olist_geolocation_dataset.csv"),
-    }
+    )
+
+
+def _materialize_parquet(name: str) -> Path:
+    """
+    WHAT:
+    Convert one default CSV into a zstd-compressed parquet file
+
+    WHY:
+    CSV text is parsed and type-inferred only once (by pyarrow's
+    multithreaded reader); later loads read typed columns (categories,
+    timestamps) straight from parquet.
+    A cache file is rebuilt whenever its CSV is newer or it was written
+    with other column types / reader options (see _cache_stamp).
+
+    NOTE:
+    Raises OSError when the cache directory cannot be written
+    """
+
+    csv_path = DATA_PATH / DATASET_FILES[name]
+    parquet_path = CACHE_PATH / f"{csv_path.stem}.parquet"
+
+    CACHE_PATH.mkdir(parents=True, exist_ok=True)
+
+    if not _cache_is_fresh(name, csv_path, parquet_path):
+        # Each process writes its own temp file and atomically renames it
+        # into place, so concurrent workers (e.g. gunicorn on a cold cache)
+        # never share a write target or read a partially written file
+        fd, tmp_path = tempfile.mkstemp(
+            dir=CACHE_PATH, prefix=f"{csv_path.stem}.", suffix=".parquet.tmp"
+        )
+        os.close(fd)
+
+        try:
+            table = _read_csv_table(name)
+            table = table.replace_schema_metadata(
+                {**(table.schema.metadata or {}), CACHE_STAMP_KEY: _cache_stamp(name)}
+            )
+            pq.write_table(table, tmp_path, compression="zstd")
+            # mkstemp creates 0600 files; cache files keep normal permissions
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, parquet_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    return parquet_path
+
+
+def _read_dataset(name: str) -> pd.DataFrame:
+    try:
+        return pd.read_parquet(_materialize_parquet(name), engine="pyarrow")
+    except OSError:
+        # Data directory not writable (e.g. a read-only deploy): parse the
+        # CSV on every load instead of failing the app import
+        return _read_csv_table(name).to_pandas()
+
+
+def _share_categories(datasets: dict) -> None:
+    """
+    WHAT:
+    Convert key columns to categoricals with one shared, sorted category
+    set per column (see SHARED_CATEGORY_COLUMNS)
+
+    WHY:
+    Categoricals only merge on codes when both sides have identical
+    categories; otherwise pandas falls back to object comparison
+    """
+
+    for column, names in SHARED_CATEGORY_COLUMNS.items():
+        columns = [datasets[name][column].astype("string") for name in names]
+
+        # One factorize over every table's values gives the shared codes
+        codes, categories = pd.factorize(
+            pd.concat(columns, ignore_index=True), sort=True
+        )
+
+        offsets = np.cumsum([len(values) for values in columns])[:-1]
+
+        for name, table_codes in zip(names, np.split(codes, offsets)):
+            datasets[name][column] = pd.Categorical.from_codes(
+                table_codes, categories=categories
+            )
+
+
+def Load_olist_datasets():
+    # pyarrow releases the GIL while parsing and reading, so the nine
+    # files are converted / loaded concurrently
+    with ThreadPoolExecutor(max_workers=len(DATASET_FILES)) as executor:
+        datasets = dict(zip(DATASET_FILES, executor.map(_read_dataset, DATASET_FILES)))
+
+    _share_categories(datasets)
+
+    # Items of one order become one contiguous run (see analytics.sum_per_order)
+    datasets["order_items"] = datasets["order_items"].sort_values(
+        "order_id", kind="stable", ignore_index=True
+    )
+
+    return datasets
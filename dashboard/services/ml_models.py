@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.linear_model import LogisticRegression
@@ -8,6 +9,8 @@ from sklearn.metrics import (
     confusion_matrix,
 )
 
+from dashboard.services.analytics import sum_per_order
+
 
 def prepare_delay_dataset(
     orders_df: pd.DataFrame,
@@ -20,40 +23,35 @@ def prepare_delay_dataset(
     WHY:
     Delivery dates come from orders
     Freight value comes from order_items
+
+    NOTE:
+    Expects orders from analytics.prepare_orders
     """
 
     # Aggregate freight value per order
-    freight_per_order = (
-        order_items_df.groupby("order_id")["freight_value"].sum().reset_index()
-    )
+    freight_per_order = sum_per_order(order_items_df, "freight_value")
+
+    # Keep delivered orders and only the columns the dataset needs;
+    # the target is precomputed
+    delivered = orders_df.loc[
+        orders_df["delay_days"].notna(),
+        [
+            "order_id",
+            "order_delivered_customer_date",
+            "order_estimated_delivery_date",
+            "is_delayed",
+        ],
+    ]
 
     # Merge with orders
-    df = orders_df.merge(
+    df = delivered.merge(
         freight_per_order,
         on="order_id",
         how="inner",
     )
 
-    # Drop rows with missing dates
-    df = df.dropna(
-        subset=[
-            "order_delivered_customer_date",
-            "order_estimated_delivery_date",
-        ]
-    )
-
-    # Convert to datetime safely
-    df["order_delivered_customer_date"] = pd.to_datetime(
-        df["order_delivered_customer_date"], errors="coerce"
-    )
-    df["order_estimated_delivery_date"] = pd.to_datetime(
-        df["order_estimated_delivery_date"], errors="coerce"
-    )
-
-    # Target variable
-    df["is_delayed"] = (
-        df["order_delivered_customer_date"] > df["order_estimated_delivery_date"]
-    ).astype(int)
+    # Target variable (the merge result is a new frame, so update in place)
+    df["is_delayed"] = df["is_delayed"].astype(int)
 
     return df
 
@@ -64,15 +62,17 @@ def train_delay_prediction_model(df: pd.DataFrame) -> dict:
     to predict delivery delays.
     """
 
-    # Using a single interpretable feature to keep the model explainable
-    X = df[["freight_value"]].fillna(0)
-    y = df["is_delayed"]
+    # Using a single interpretable feature to keep the model explainable.
+    # Plain NumPy arrays spare sklearn the DataFrame validation and copy.
+    X = df["freight_value"].to_numpy(dtype=np.float64, na_value=0.0).reshape(-1, 1)
+    y = df["is_delayed"].to_numpy(dtype=np.int8)
 
     X_train, X_test, y_train, y_test = train_test_split(
         X, y, test_size=0.2, random_state=42
     )
 
-    model = LogisticRegression(class_weight="balanced")
+    # liblinear converges in a handful of iterations on a single feature
+    model = LogisticRegression(class_weight="balanced", solver="liblinear", max_iter=50)
     model.fit(X_train, y_train)
 
     y_pred = model.predict(X_test)
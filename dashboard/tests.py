@@ -1,3 +1,481 @@
-from django.test import TestCase
+import tempfile
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.test import SimpleTestCase
+
+from dashboard.services import default_dataset
+from dashboard.services.analytics import (
+    _group_nansum,
+    build_retention_insight,
+    calculate_total_revenue,
+    fast_to_datetime,
+    sum_per_order,
+)
+
+# =========================================================
+# ORDER PREPARATION
+# =========================================================
+
+
+class FastToDatetimeTests(SimpleTestCase):
+    """
+    fast_to_datetime must match pd.to_datetime(errors="coerce")
+    """
+
+    def test_strings_with_missing_and_unparseable_values(self):
+        values = [
+            "2017-10-02 10:56:33",
+            None,
+            "not a date",
+            "2018-13-45 00:00:00",
+            "2017-10-02 10:56:33",
+            np.nan,
+            # Last distinct value, so a missing value mapped onto it shows up
+            "2018-07-24 20:41:37",
+        ]
+
+        for dtype in (object, "string"):
+            with self.subTest(dtype=dtype):
+                series = pd.Series(
+                    values,
+                    index=[10, 3, 7, 1, 42, 5, 8],
+                    name="order_purchase_timestamp",
+                    dtype=dtype,
+                )
+
+                result = fast_to_datetime(series)
+
+                pd.testing.assert_series_equal(
+                    result, pd.to_datetime(series, errors="coerce")
+                )
+                self.assertEqual(int(result.isna().sum()), 4)
+
+    def test_all_missing(self):
+        series = pd.Series([None, None], index=["a", "b"], dtype=object)
+
+        pd.testing.assert_series_equal(
+            fast_to_datetime(series), pd.to_datetime(series, errors="coerce")
+        )
+
+    def test_datetime_input_is_returned_as_is(self):
+        series = pd.Series(pd.to_datetime(["2017-10-02", None]))
+
+        self.assertIs(fast_to_datetime(series), series)
+
+
+# =========================================================
+# PER-ORDER / PER-KEY SUMS
+# =========================================================
+
+
+class SumPerOrderTests(SimpleTestCase):
+    """
+    sum_per_order must match groupby("order_id")[column].sum()
+    """
+
+    def assert_matches_groupby(self, items: pd.DataFrame, column: str = "price"):
+        expected = items.groupby("order_id", observed=True)[column].sum().reset_index()
+
+        pd.testing.assert_frame_equal(
+            sum_per_order(items, column), expected, check_dtype=False
+        )
+
+    def test_sorted_ids(self):
+        items = pd.DataFrame(
+            {"order_id": ["a", "a", "b", "c", "c", "c"], "price": range(6)}
+        )
+
+        self.assert_matches_groupby(items)
+
+    def test_unsorted_ids(self):
+        items = pd.DataFrame(
+            {"order_id": ["c", "a", "b", "a", "c"], "price": [1.0, 2, 3, 4, 5]}
+        )
+
+        self.assert_matches_groupby(items)
+
+    def test_missing_ids_and_values(self):
+        items = pd.DataFrame(
+            {
+                "order_id": ["b", None, "a", "b", None, "a"],
+                "price": [1.0, 2.0, np.nan, 4.0, np.nan, np.nan],
+            }
+        )
+
+        self.assert_matches_groupby(items)
+
+    def test_categorical_ids_with_unsorted_categories(self):
+        order_ids = pd.Categorical(
+            ["b", "a", None, "c", "a", "b"], categories=["c", "a", "b", "unused"]
+        )
+        items = pd.DataFrame(
+            {"order_id": order_ids, "price": [1.0, 2.0, 3.0, np.nan, 4.0, 5.0]}
+        )
+
+        self.assert_matches_groupby(items)
+
+    def test_nullable_string_ids(self):
+        for dtype in ("string", "string[pyarrow]"):
+            with self.subTest(dtype=dtype):
+                items = pd.DataFrame(
+                    {
+                        "order_id": pd.array(["b", "a", "a", "b"], dtype=dtype),
+                        "price": [1.0, 2.0, 3.0, 4.0],
+                    }
+                )
+
+                self.assert_matches_groupby(items)
+
+    def test_nullable_string_ids_with_missing_ids(self):
+        items = pd.DataFrame(
+            {
+                "order_id": pd.array(["b", None, "a", "b"], dtype="string"),
+                "price": [1.0, 2.0, np.nan, 4.0],
+            }
+        )
+
+        self.assert_matches_groupby(items)
+
+    def test_other_columns_are_ignored(self):
+        items = pd.DataFrame(
+            {
+                "order_id": ["b", "a", "b"],
+                "price": [1.0, 2.0, 3.0],
+                "freight_value": [np.nan, 5.0, 6.0],
+            }
+        )
+
+        self.assert_matches_groupby(items, "freight_value")
+
+    def test_empty_frame(self):
+        items = pd.DataFrame(
+            {
+                "order_id": pd.Series([], dtype=object),
+                "price": pd.Series([], dtype=float),
+            }
+        )
+
+        result = sum_per_order(items, "price")
+
+        self.assertTrue(result.empty)
+        self.assertEqual(list(result.columns), ["order_id", "price"])
+
+
+class GroupNansumTests(SimpleTestCase):
+    """
+    _group_nansum must match groupby(keys).sum()
+    """
+
+    def assert_matches_groupby(self, keys: pd.Series, values: pd.Series):
+        expected = values.groupby(keys, observed=True).sum()
+
+        pd.testing.assert_series_equal(
+            _group_nansum(keys, values), expected, check_dtype=False, check_names=False
+        )
+
+    def test_unsorted_keys_with_missing_keys_and_values(self):
+        keys = pd.Series(["z", "x", None, "y", "x", "z"], name="key")
+        values = pd.Series([1.0, np.nan, 2.0, 3.0, 4.0, np.nan])
+
+        self.assert_matches_groupby(keys, values)
+
+    def test_categorical_keys_with_unsorted_categories(self):
+        keys = pd.Series(
+            pd.Categorical(["b", "a", None, "c", "a"], categories=["c", "b", "a"]),
+            name="key",
+        )
+        values = pd.Series([1.0, 2.0, 3.0, 4.0, np.nan])
+
+        self.assert_matches_groupby(keys, values)
+
+    def test_month_keys(self):
+        keys = pd.Series([24_300, 24_290, 24_300, 24_295], name="month")
+        values = pd.Series([10.0, 5.0, 2.5, np.nan])
+
+        self.assert_matches_groupby(keys, values)
+
+    def test_empty(self):
+        result = _group_nansum(
+            pd.Series([], dtype=object, name="key"), pd.Series([], dtype=float)
+        )
+
+        self.assertTrue(result.empty)
+        self.assertEqual(result.index.name, "key")
+
+
+# =========================================================
+# KPI FUNCTIONS
+# =========================================================
+
+
+class TotalRevenueTests(SimpleTestCase):
+    """
+    calculate_total_revenue must match (price + freight_value).sum(): an
+    item with either value missing is left out entirely
+    """
+
+    def assert_matches_item_sum(self, items: pd.DataFrame):
+        expected = round(float((items["price"] + items["freight_value"]).sum()), 2)
+
+        self.assertEqual(calculate_total_revenue(items), expected)
+
+    def test_price_present_freight_missing(self):
+        items = pd.DataFrame(
+            {"price": [10.0, 20.0, 30.0], "freight_value": [np.nan, 5.0, 2.5]}
+        )
+
+        self.assertEqual(calculate_total_revenue(items), 57.5)
+        self.assert_matches_item_sum(items)
+
+    def test_freight_present_price_missing(self):
+        items = pd.DataFrame(
+            {"price": [np.nan, 20.0, 30.0], "freight_value": [4.0, 5.0, 2.5]}
+        )
+
+        self.assertEqual(calculate_total_revenue(items), 57.5)
+        self.assert_matches_item_sum(items)
+
+    def test_no_missing_values(self):
+        items = pd.DataFrame(
+            {"price": [10.0, 20.125, 30.0], "freight_value": [1.0, 5.0, 2.5]}
+        )
+
+        self.assert_matches_item_sum(items)
+
+    def test_empty(self):
+        items = pd.DataFrame(
+            {
+                "price": pd.Series([], dtype=float),
+                "freight_value": pd.Series([], dtype=float),
+            }
+        )
+
+        self.assertEqual(calculate_total_revenue(items), 0.0)
+
+
+# =========================================================
+# RETENTION INSIGHT
+# =========================================================
+
+CRITICAL_RECOMMENDATION = (
+    "Retention is critically low. Prioritizing improvements in delivery"
+    " reliability and post-purchase experience could significantly improve"
+    " repeat purchases."
+)
+EARLY_RECOMMENDATION = (
+    "Retention shows early potential. Targeted improvements in customer"
+    " experience could help convert first-time buyers into repeat customers."
+)
+HEALTHY_RECOMMENDATION = (
+    "Retention performance is healthy. Continued focus on customer experience"
+    " can help sustain repeat purchasing behavior."
+)
+
+
+class RetentionInsightTests(SimpleTestCase):
+    """
+    build_retention_insight bands are half-open: [0, 25) [25, 50) [50, 75)
+    [75, 100] for repeat_rate and [0, 25) [25, 50) [50, 100] for delay_rate
+    """
+
+    def test_retention_band_edges(self):
+        cases = [
+            (0, "low", 3, CRITICAL_RECOMMENDATION),
+            (24.99, "low", 3, CRITICAL_RECOMMENDATION),
+            (25, "moderate", 2, EARLY_RECOMMENDATION),
+            (49.99, "moderate", 2, EARLY_RECOMMENDATION),
+            (50, "strong", 1, HEALTHY_RECOMMENDATION),
+            (74.99, "strong", 1, HEALTHY_RECOMMENDATION),
+            (75, "very strong", 0, HEALTHY_RECOMMENDATION),
+            (100, "very strong", 0, HEALTHY_RECOMMENDATION),
+        ]
+
+        for repeat_rate, band, severity, recommendation in cases:
+            with self.subTest(repeat_rate=repeat_rate):
+                insight = build_retention_insight(repeat_rate, 0, 100)
+
+                self.assertEqual(insight["retention_band"], band)
+                self.assertEqual(insight["severity_score"], severity)
+                self.assertEqual(insight["recommendation"], recommendation)
+
+    def test_delay_driver_edges(self):
+        cases = [
+            # (delayed_orders, total_orders, primary_driver, message start)
+            (0, 0, "post-purchase engagement", "Delivery performance appears"),
+            (2499, 10000, "post-purchase engagement", "Delivery performance appears"),
+            (25, 100, "delivery experience", "Delivery delays affect"),
+            (4999, 10000, "delivery experience", "Delivery delays affect"),
+            (50, 100, "logistics reliability", "A high delivery delay rate"),
+            (100, 100, "logistics reliability", "A high delivery delay rate"),
+        ]
+
+        for delayed_orders, total_orders, driver, message in cases:
+            with self.subTest(delay_rate=delayed_orders / (total_orders or 1) * 100):
+                insight = build_retention_insight(30, delayed_orders, total_orders)
+
+                self.assertEqual(insight["primary_driver"], driver)
+                self.assertTrue(insight["driver_message"].startswith(message))
+
+    def test_rates_and_summary(self):
+        insight = build_retention_insight(24.994, 2499, 10000)
+
+        self.assertEqual(insight["repeat_rate"], 24.99)
+        self.assertEqual(insight["delay_rate"], 24.99)
+        self.assertEqual(
+            insight["summary_message"],
+            "Customer retention is low, with only 24.99% of customers placing"
+            " repeat orders.",
+        )
+
+
+# =========================================================
+# DATASET LOADING
+# =========================================================
+
+
+class ShareCategoriesTests(SimpleTestCase):
+    """
+    _share_categories must give every table of a key the same sorted
+    categories without changing any value
+    """
+
+    def setUp(self):
+        self.datasets = {
+            "orders": pd.DataFrame(
+                {"order_id": ["o3", "o1", "o2"], "status": ["a", "b", "c"]}
+            ),
+            "order_items": pd.DataFrame(
+                {"order_id": ["o2", "o4", None, "o1"], "price": [1.0, 2, 3, 4]}
+            ),
+            "order_payments": pd.DataFrame(
+                {
+                    "order_id": ["o1"],
+                    "payment_type": pd.Categorical(["voucher"]),
+                }
+            ),
+        }
+        self.originals = {name: frame.copy() for name, frame in self.datasets.items()}
+
+        shared_columns = {
+            "order_id": ["orders", "order_items", "order_payments"],
+            "payment_type": ["order_payments"],
+        }
+
+        with mock.patch.object(
+            default_dataset, "SHARED_CATEGORY_COLUMNS", shared_columns
+        ):
+            default_dataset._share_categories(self.datasets)
+
+    def test_categories_are_shared_and_sorted(self):
+        categories = [
+            self.datasets[name]["order_id"].cat.categories
+            for name in ("orders", "order_items", "order_payments")
+        ]
+
+        self.assertEqual(list(categories[0]), ["o1", "o2", "o3", "o4"])
+
+        for table_categories in categories[1:]:
+            self.assertTrue(table_categories.equals(categories[0]))
+
+    def test_values_are_preserved(self):
+        for name, original in self.originals.items():
+            for column in ("order_id", "payment_type"):
+                if column not in original:
+                    continue
+
+                pd.testing.assert_series_equal(
+                    self.datasets[name][column].astype("string"),
+                    original[column].astype("string"),
+                )
+
+    def test_missing_values_stay_missing(self):
+        self.assertTrue(self.datasets["order_items"]["order_id"].isna().iloc[2])
+
+    def test_other_columns_are_untouched(self):
+        pd.testing.assert_series_equal(
+            self.datasets["order_items"]["price"],
+            self.originals["order_items"]["price"],
+        )
+
+
+class ReadDatasetTests(SimpleTestCase):
+    """
+    _read_dataset must serve the same frame with or without a writable
+    parquet cache
+    """
+
+    name = "category_translation"
+
+    def read_with_cache_dir(self, cache_dir: Path) -> pd.DataFrame:
+        with mock.patch.object(default_dataset, "CACHE_PATH", cache_dir):
+            return default_dataset._read_dataset(self.name)
+
+    def test_builds_and_reads_the_cache(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            frame = self.read_with_cache_dir(Path(cache_dir))
+
+            self.assertEqual(
+                [path.suffix for path in Path(cache_dir).iterdir()], [".parquet"]
+            )
+
+        self.assertFalse(frame.empty)
+
+    def test_unwritable_cache_falls_back_to_csv(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            expected = self.read_with_cache_dir(Path(cache_dir) / "writable")
+
+            with mock.patch.object(
+                default_dataset.tempfile, "mkstemp", side_effect=PermissionError
+            ):
+                frame = self.read_with_cache_dir(Path(cache_dir) / "read_only")
+
+            self.assertEqual(list((Path(cache_dir) / "read_only").iterdir()), [])
+
+        pd.testing.assert_frame_equal(frame, expected)
+
+    def test_uncreatable_cache_dir_falls_back_to_csv(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            expected = self.read_with_cache_dir(Path(cache_dir))
+
+        with mock.patch.object(Path, "mkdir", side_effect=PermissionError):
+            frame = self.read_with_cache_dir(Path(cache_dir))
+
+        pd.testing.assert_frame_equal(frame, expected)
+
+    def test_column_type_change_rebuilds_the_cache(self):
+        column_types = {self.name: {"product_category_name": pa.string()}}
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cached = self.read_with_cache_dir(Path(cache_dir))
+
+            with mock.patch.object(
+                default_dataset, "DATASET_COLUMN_TYPES", column_types
+            ):
+                rebuilt = self.read_with_cache_dir(Path(cache_dir))
+
+        self.assertIsInstance(
+            cached["product_category_name"].dtype, pd.CategoricalDtype
+        )
+        self.assertNotIsInstance(
+            rebuilt["product_category_name"].dtype, pd.CategoricalDtype
+        )
+
+    def test_unstamped_cache_is_rebuilt(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            expected = self.read_with_cache_dir(Path(cache_dir))
+
+            # A cache file written before stamping, newer than its CSV
+            csv_name = default_dataset.DATASET_FILES[self.name]
+            pq.write_table(
+                pa.table({"stale": [1]}),
+                Path(cache_dir) / csv_name.replace(".csv", ".parquet"),
+            )
+
+            frame = self.read_with_cache_dir(Path(cache_dir))
+
+        pd.testing.assert_frame_equal(frame, expected)
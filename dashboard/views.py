@@ -1,6 +1,8 @@
 from django.shortcuts import render
 from django.http import HttpResponse
+from functools import lru_cache
 import csv
+import io
 
 # ======================
 # DATA LOADING
@@ -11,6 +13,9 @@ from dashboard.services.default_dataset import Load_olist_datasets
 # ANALYTICS (KPIs + CHARTS + TIER-2)
 # ======================
 from dashboard.services.analytics import (
+    prepare_orders,
+    prepare_orders_customers,
+    prepare_revenue_per_order,
     calculate_total_orders,
     calculate_total_revenue,
     calculate_delayed_orders,
@@ -49,21 +54,65 @@ from dashboard.services.dataOvervire import (
 # Load default Olist datasets ONCE
 data = Load_olist_datasets()
 
+# Parse order dates and delay columns ONCE for every delay-based metric
+orders = prepare_orders(data["orders"])
+
+# Product revenue per order, shared by AOV, segmentation and payments
+revenue_per_order = prepare_revenue_per_order(data["order_items"])
+
+# Orders joined to customer_unique_id, shared by repeat rate and segmentation
+orders_customers = prepare_orders_customers(data["orders"], data["customers"])
+
 
 # =========================================================
-# DASHBOARD
+# CACHED RESULTS
 # =========================================================
-def dashboard_home(request):
+# The default dataset never changes while the process runs, so every
+# KPI, chart and model result is computed on first use and reused.
+
+
+@lru_cache(maxsize=None)
+def _default_kpis():
+    return {
+        "orders_count": calculate_total_orders(data["orders"]),
+        "total_revenue": round(calculate_total_revenue(data["order_items"]), 2),
+        "delayed_orders": calculate_delayed_orders(orders),
+        "avg_review": calculate_average_review_score(data["order_reviews"]),
+        "repeat_rate": calculate_repeat_customer_rate(orders_customers),
+    }
+
+
+@lru_cache(maxsize=None)
+def _default_kpi_csv():
+    kpis = _default_kpis()
+
+    rows = {
+        "Total Orders": kpis["orders_count"],
+        "Total Revenue": kpis["total_revenue"],
+        "Delayed Orders": kpis["delayed_orders"],
+        "Average Review Score": kpis["avg_review"],
+        "Repeat Customer Rate (%)": round(kpis["repeat_rate"], 2),
+    }
+
+    buffer = io.StringIO()
+
+    writer = csv.writer(buffer)
+    writer.writerow(["Metric", "Value"])
+
+    for metric, value in rows.items():
+        writer.writerow([metric, value])
+
+    return buffer.getvalue().encode("utf-8")
+
+
+@lru_cache(maxsize=None)
+def _default_dashboard_context():
 
     # ---------- KPIs ----------
-    orders_count = calculate_total_orders(data["orders"])
-    total_revenue = calculate_total_revenue(data["order_items"])
-    delayed_orders = calculate_delayed_orders(data["orders"])
-    avg_review = calculate_average_review_score(data["order_reviews"])
-    repeat_rate = calculate_repeat_customer_rate(data["orders"], data["customers"])
+    kpis = _default_kpis()
 
     # ---------- Tier-1 Charts ----------
-    orders_time_df = orders_over_time(data["orders"])
+    orders_time_df = orders_over_time(orders)
 
     revenue_df = revenue_by_category(
         data["order_items"],
@@ -71,54 +120,49 @@ def dashboard_home(request):
         data["category_translation"],
     )
 
-    delay_dist = delivery_delay_distribution(data["orders"])
+    delay_dist = delivery_delay_distribution(orders)
 
     aov_data = calculate_aov_over_time(
-        data["orders"],
-        data["order_items"],
+        orders,
+        revenue_per_order,
     )
 
     # ---------- Tier-2 Analytics ----------
     segmentation_df = customer_segmentation(
-        data["orders"],
-        data["order_items"],
-        data["customers"],
+        orders_customers,
+        revenue_per_order,
     )
 
     review_delay_df = review_vs_delay(
-        data["orders"],
+        orders,
         data["order_reviews"],
     )
 
     payment_df = payment_method_analysis(
         data["order_payments"],
-        data["order_items"],
+        revenue_per_order,
     )
 
     retention_insight = build_retention_insight(
-        repeat_rate=repeat_rate,
-        delayed_orders=delayed_orders,
-        total_orders=orders_count,
+        repeat_rate=kpis["repeat_rate"],
+        delayed_orders=kpis["delayed_orders"],
+        total_orders=kpis["orders_count"],
     )
 
     # ---------- Tier-4 Data Quality ----------
     summary = dataset_summary(data["orders"])
     missing = missing_values_report(data["orders"])
     duplicates = duplicate_report(data["orders"])
-    risks = risk_highlights(data["orders"], data["order_reviews"])
+    risks = risk_highlights(orders, data["order_reviews"])
 
     order_items_check = order_items_integrity_check(data["orders"], data["order_items"])
 
     customer_linkage = customer_linkage_check(data["orders"], data["customers"])
 
     # ---------- Context ----------
-    context = {
+    return {
         # KPIs
-        "orders_count": orders_count,
-        "total_revenue": round(total_revenue, 2),
-        "delayed_orders": delayed_orders,
-        "avg_review": avg_review,
-        "repeat_rate": repeat_rate,
+        **kpis,
         # Charts
         "orders_time_data": orders_time_df.to_dict(orient="records"),
         "rev_cat_labels": revenue_df["product_category_name_english"].tolist(),
@@ -141,6 +185,24 @@ def dashboard_home(request):
         "customer_linkage": customer_linkage,
     }
 
+
+@lru_cache(maxsize=None)
+def _default_ml_results():
+    delay_df = prepare_delay_dataset(
+        orders,
+        data["order_items"],
+    )
+
+    return train_delay_prediction_model(delay_df)
+
+
+# =========================================================
+# DASHBOARD
+# =========================================================
+def dashboard_home(request):
+    # Shallow copy so per-request context changes never reach the cache
+    context = dict(_default_dashboard_context())
+
     return render(request, "dashboard/pages/dashboard.html", context)
 
 
@@ -152,26 +214,10 @@ def export_kpis(request):
     Export KPI metrics as CSV
     """
 
-    kpis = {
-        "Total Orders": calculate_total_orders(data["orders"]),
-        "Total Revenue": round(calculate_total_revenue(data["order_items"]), 2),
-        "Delayed Orders": calculate_delayed_orders(data["orders"]),
-        "Average Review Score": calculate_average_review_score(data["order_reviews"]),
-        "Repeat Customer Rate (%)": round(
-            calculate_repeat_customer_rate(data["orders"], data["customers"]),
-            2,
-        ),
-    }
-
-    response = HttpResponse(content_type="text/csv")
+    # The report never changes for the default dataset: serve the cached bytes
+    response = HttpResponse(_default_kpi_csv(), content_type="text/csv")
     response["Content-Disposition"] = 'attachment; filename="kpi_report.csv"'
 
-    writer = csv.writer(response)
-    writer.writerow(["Metric", "Value"])
-
-    for metric, value in kpis.items():
-        writer.writerow([metric, value])
-
     return response
 
 
@@ -187,19 +233,14 @@ def upload_data(request):
 # =========================================================
 def Ml_results(request):
 
-    delay_df = prepare_delay_dataset(
-        data["orders"],
-        data["order_items"],
-    )
-
-    ml_results = train_delay_prediction_model(delay_df)
+    kpis = _default_kpis()
 
     context = {
-        "total_orders": calculate_total_orders(data["orders"]),
-        "total_revenue": round(calculate_total_revenue(data["order_items"]), 2),
-        "delayed_orders": calculate_delayed_orders(data["orders"]),
-        "avg_review": calculate_average_review_score(data["order_reviews"]),
-        "ml": ml_results,
+        "total_orders": kpis["orders_count"],
+        "total_revenue": kpis["total_revenue"],
+        "delayed_orders": kpis["delayed_orders"],
+        "avg_review": kpis["avg_review"],
+        "ml": _default_ml_results(),
     }
 
     return render(request, "dashboard/pages/results.html", context)